@@ -3,18 +3,23 @@
 Run in a separate terminal:
     python mock_server.py
 
-Listens on http://localhost:9000 and saves uploaded files to ./mock_uploads/
+Listens on http://localhost:9000, saves uploaded files to ./mock_uploads/
+and serves them back for restores.
 """
 
 import json
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
 
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "mock_uploads")
 
 
 class MockHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse connections across requests
+    protocol_version = "HTTP/1.1"
+
     def do_POST(self):
         content_length = int(self.headers.get("Content-Length", 0))
         body = self.rfile.read(content_length)
@@ -28,6 +33,49 @@ class MockHandler(BaseHTTPRequestHandler):
         else:
             self._respond(404, {"success": False, "error": "not found"})
 
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: os.path.basename(values[0]) for key, values in parse_qs(url.query).items()}
+        backup_dir = os.path.join(UPLOAD_DIR, params.get("backup_id", "unknown"))
+        backup_name = params.get("backup_name", "unknown")
+
+        if url.path == "/api/manifest":
+            self._send_file(os.path.join(backup_dir, "manifest.db"))
+        elif url.path == "/api/file":
+            self._send_file(os.path.join(backup_dir, "complete", backup_name))
+        elif url.path == "/api/chunk":
+            chunk_index = int(params.get("chunk_index", "0"))
+            self._send_file(os.path.join(backup_dir, "chunked", backup_name, f"chunk_{chunk_index:03d}"))
+        elif url.path == "/api/chunks":
+            self._handle_list_chunks(os.path.join(backup_dir, "chunked", backup_name))
+        else:
+            self._respond(404, {"success": False, "error": "not found"})
+
+    def _handle_list_chunks(self, chunk_dir):
+        if not os.path.isdir(chunk_dir):
+            self._respond(404, {"success": False, "error": "not found"})
+            return
+
+        chunks = []
+        for name in sorted(os.listdir(chunk_dir)):
+            if name.startswith("chunk_"):
+                size = os.path.getsize(os.path.join(chunk_dir, name))
+                chunks.append({"chunk_index": int(name[len("chunk_"):]), "size": size})
+        self._respond(200, {"success": True, "chunks": chunks})
+
+    def _send_file(self, path):
+        if not os.path.isfile(path):
+            self._respond(404, {"success": False, "error": "not found"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while block := f.read(64 * 1024):
+                self.wfile.write(block)
+
     def _handle_upload(self, body):
         # Parse multipart to extract backup_id, backup_name, and file data
         info = self._parse_multipart(body)
@@ -130,10 +178,12 @@ class MockHandler(BaseHTTPRequestHandler):
         return result
 
     def _respond(self, status, data):
+        body = json.dumps(data).encode()
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
 
     def log_message(self, format, *args):
         # Quieter logging — just method + path
@@ -142,7 +192,7 @@ class MockHandler(BaseHTTPRequestHandler):
 
 if __name__ == "__main__":
     port = 9000
-    server = HTTPServer(("localhost", port), MockHandler)
+    server = ThreadingHTTPServer(("localhost", port), MockHandler)
     print(f"Mock API server running on http://localhost:{port}")
     print(f"Uploads will be saved to {UPLOAD_DIR}/")
     print("Press Ctrl+C to stop.\n")
@@ -0,0 +1,196 @@
+"""Compare the original and compact state.db schemas on a synthetic library.
+
+Run from the repository root:
+    PYTHONPATH=src python scripts/bench_schema.py [--rows 1000000]
+
+Builds a version-0 state.db (full path as key, string enums, ISO timestamps)
+for a deep year/month/event tree, times the queries the CLI runs against it,
+migrates a copy in place with migrate_db, and times the same queries again.
+Results are printed and written to ./bench_output.txt.
+"""
+
+import argparse
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from mediabackup.init import migrate_db
+from mediabackup.state import STATUS, get_dir_id, load_dir_ids
+
+# The files table as it was before the compact schema (user_version 0)
+SCHEMA_V0 = """\
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    backup_name TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    chunks_total INTEGER,
+    chunks_uploaded INTEGER DEFAULT 0,
+    discovered_at TEXT NOT NULL,
+    uploaded_at TEXT
+);
+
+CREATE TABLE counters (
+    file_type TEXT PRIMARY KEY,
+    next_number INTEGER DEFAULT 1
+);
+
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+FILE_TYPES = ["image", "video", "audio", "document"]
+LOOKUPS = 20000
+LIBRARY_ROOT = Path("/library")  # scans see absolute paths under the backed-up directory
+
+
+def _build_v0(db_path: Path, rows: int) -> list:
+    """Fill a version-0 state.db. Returns paths for lookup timing.
+
+    The sample is a contiguous run of the sorted paths, as absolute Path
+    objects, which is what a scan sees: sorted(rglob) yields files grouped by
+    directory.
+    """
+    dirs = [
+        f"Photos/{year}/{month:02d}-{MONTHS[month - 1]}/event_{event:03d}_camera_roll"
+        for year in range(2000, 2026)
+        for month in range(1, 13)
+        for event in range(32)
+    ]
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA_V0)
+    paths = []
+
+    def generate():
+        for i in range(rows):
+            path = f"{random.choice(dirs)}/IMG_{i:08d}_original.jpg"
+            paths.append(path)
+            status = "pending" if random.random() < 0.3 else "complete"
+            yield (
+                path, f"IMG_{i:06d}.jpg", FILE_TYPES[i % 4], random.randint(10_000, 20_000_000),
+                status, None, 0, "2026-10-19T01:24:31.775616+00:00", None,
+            )
+
+    conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", generate())
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    paths.sort()
+    start = random.randrange(max(rows - LOOKUPS, 0) + 1)
+    return [LIBRARY_ROOT / path for path in paths[start:start + LOOKUPS]]
+
+
+def _time_ms(func, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _bench_v0(db_path: Path, paths: list) -> dict:
+    conn = sqlite3.connect(db_path)
+
+    def lookups():
+        # Same key as the version-0 scan_directory
+        for path in paths:
+            relative = str(path.relative_to(LIBRARY_ROOT))
+            conn.execute("SELECT 1 FROM files WHERE path = ?", (relative,)).fetchone()
+
+    results = {
+        "next pending file": _time_ms(lambda: conn.execute(
+            "SELECT path, backup_name, size, chunks_total, chunks_uploaded FROM files "
+            "WHERE status = 'pending' ORDER BY size ASC LIMIT 1"
+        ).fetchall(), repeat=20),
+        "remaining count": _time_ms(lambda: conn.execute(
+            "SELECT COUNT(*) FROM files WHERE status IN ('pending', 'uploading')"
+        ).fetchall(), repeat=5),
+        "status summary": _time_ms(lambda: (
+            conn.execute("SELECT file_type, COUNT(*), SUM(size) FROM files GROUP BY file_type").fetchall(),
+            conn.execute("SELECT status, COUNT(*), SUM(size) FROM files GROUP BY status").fetchall(),
+        ), repeat=3),
+        f"scanner lookups x{len(paths)}": _time_ms(lookups),
+    }
+    conn.close()
+    return results
+
+
+def _bench_v1(db_path: Path, paths: list) -> dict:
+    conn = sqlite3.connect(db_path)
+
+    def lookups():
+        # Same dir_id resolution as scan_directory
+        dir_ids = load_dir_ids(conn)
+        last_parent = dir_id = None
+        for path in paths:
+            if path.parent != last_parent:
+                last_parent = path.parent
+                dir_id = get_dir_id(conn, last_parent.relative_to(LIBRARY_ROOT).parts, dir_ids)
+            conn.execute(
+                "SELECT 1 FROM files WHERE dir_id = ? AND name = ?", (dir_id, path.name)
+            ).fetchone()
+
+    results = {
+        "next pending file": _time_ms(lambda: conn.execute(
+            "SELECT id, dir_id, name, backup_name, size, chunks_total, chunks_uploaded FROM files "
+            "WHERE status = ? AND (size, id) > (?, ?) ORDER BY size ASC, id ASC LIMIT 1",
+            (STATUS["pending"], -1, -1),
+        ).fetchall(), repeat=20),
+        "remaining count": _time_ms(lambda: conn.execute(
+            "SELECT COUNT(*) FROM files WHERE status IN (?, ?)",
+            (STATUS["pending"], STATUS["uploading"]),
+        ).fetchall(), repeat=5),
+        "status summary": _time_ms(lambda: (
+            conn.execute("SELECT file_type, COUNT(*), SUM(size) FROM files GROUP BY file_type").fetchall(),
+            conn.execute("SELECT status, COUNT(*), SUM(size) FROM files GROUP BY status").fetchall(),
+        ), repeat=3),
+        f"scanner lookups x{len(paths)}": _time_ms(lookups),
+    }
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="files in the synthetic library")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_output.txt")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        old_db = Path(tmp) / "old.db"
+        new_db = Path(tmp) / "state.db"
+
+        print(f"Building version-0 state.db with {args.rows} rows...")
+        paths = _build_v0(old_db, args.rows)
+        shutil.copyfile(old_db, new_db)
+
+        old_results = _bench_v0(old_db, paths)
+        migrate_ms = _time_ms(lambda: migrate_db(new_db))
+        new_results = _bench_v1(new_db, paths)
+
+        lines = [
+            f"rows: {args.rows}",
+            f"state.db size: {old_db.stat().st_size / 2**20:.1f} MB -> {new_db.stat().st_size / 2**20:.1f} MB",
+            f"migration: {migrate_ms / 1000:.1f} s",
+        ]
+        for name, old_ms in old_results.items():
+            lines.append(f"{name}: {old_ms:.2f} ms -> {new_results[name]:.2f} ms")
+
+    report = "\n".join(lines) + "\n"
+    print(report, end="")
+    Path(args.output).write_text(report)
+
+
+if __name__ == "__main__":
+    main()
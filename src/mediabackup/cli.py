@@ -1,8 +1,9 @@
 import argparse
 from pathlib import Path
 
-from mediabackup.init import init_backup
+from mediabackup.init import DEFAULT_API_ENDPOINT, init_backup
 from mediabackup.manifest import sync_manifest
+from mediabackup.restore import DEFAULT_WORKERS, restore_backup
 from mediabackup.scanner import scan_directory
 from mediabackup.status import print_status
 from mediabackup.uploader import upload_pending
@@ -54,6 +55,13 @@ def cmd_sync(args):
     sync_manifest(directory, config)
 
 
+def cmd_restore(args):
+    """Download a backup from the server into a target directory."""
+    target = Path(args.target).resolve()
+    print(f"Backup ID: {args.backup_id}\n")
+    restore_backup(args.backup_id, target, args.api_endpoint, args.workers)
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog="mediabackup",
@@ -70,5 +78,12 @@ def main():
         sp.add_argument("directory", help="Path to the media directory")
         sp.set_defaults(func=func)
 
+    sp = subparsers.add_parser("restore", help="Download a backup into a directory (resumable)")
+    sp.add_argument("backup_id", help="Backup ID to restore, e.g. bkp_a8f2e3b7")
+    sp.add_argument("target", help="Directory to restore into")
+    sp.add_argument("--api-endpoint", default=DEFAULT_API_ENDPOINT, help="API to download from")
+    sp.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Downloads in flight (default: %(default)s)")
+    sp.set_defaults(func=cmd_restore)
+
     args = parser.parse_args()
     args.func(args)
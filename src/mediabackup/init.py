@@ -1,27 +1,50 @@
 import json
 import sqlite3
 import uuid
+from datetime import datetime
 from pathlib import Path
 
+from mediabackup.state import FILE_TYPE, STATUS, get_dir_id
+
 BACKUP_DIR_NAME = ".mediabackup"
 CONFIG_FILE = "config.json"
 STATE_DB = "state.db"
 
+DEFAULT_API_ENDPOINT = "https://api.yourapp.com"
 DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB
+DEFAULT_PREFETCH_DEPTH = 2  # buffers read ahead of the one being sent
+
+# Bumped whenever SCHEMA changes; stored in PRAGMA user_version.
+# Version 0 is the original schema keyed by full path with string enums.
+SCHEMA_VERSION = 1
 
 SCHEMA = """\
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER REFERENCES dirs(id),
+    name TEXT NOT NULL,
+    UNIQUE (parent_id, name)
+);
+
+INSERT OR IGNORE INTO dirs (id, parent_id, name) VALUES (0, NULL, '');
+
 CREATE TABLE IF NOT EXISTS files (
-    path TEXT PRIMARY KEY,
+    id INTEGER PRIMARY KEY,
+    dir_id INTEGER NOT NULL REFERENCES dirs(id),
+    name TEXT NOT NULL,
     backup_name TEXT NOT NULL,
-    file_type TEXT NOT NULL,
+    file_type INTEGER NOT NULL,
     size INTEGER NOT NULL,
-    status TEXT NOT NULL,
+    status INTEGER NOT NULL,
     chunks_total INTEGER,
     chunks_uploaded INTEGER DEFAULT 0,
-    discovered_at TEXT NOT NULL,
-    uploaded_at TEXT
+    discovered_at INTEGER NOT NULL,
+    uploaded_at INTEGER,
+    UNIQUE (dir_id, name)
 );
 
+CREATE INDEX IF NOT EXISTS files_status_size ON files (status, size);
+
 CREATE TABLE IF NOT EXISTS counters (
     file_type TEXT PRIMARY KEY,
     next_number INTEGER DEFAULT 1
@@ -39,12 +62,13 @@ def _generate_backup_id():
     return f"bkp_{short}"
 
 
-def _create_config(backup_dir: Path, directory: Path, api_endpoint: str = "https://api.yourapp.com"):
+def _create_config(backup_dir: Path, directory: Path, api_endpoint: str = DEFAULT_API_ENDPOINT):
     config = {
         "backup_id": _generate_backup_id(),
         "directory_name": directory.name,
         "api_endpoint": api_endpoint,
         "chunk_size": DEFAULT_CHUNK_SIZE,
+        "prefetch_depth": DEFAULT_PREFETCH_DEPTH,
     }
     config_path = backup_dir / CONFIG_FILE
     config_path.write_text(json.dumps(config, indent=2))
@@ -55,7 +79,59 @@ def _create_db(backup_dir: Path):
     db_path = backup_dir / STATE_DB
     conn = sqlite3.connect(db_path)
     conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.close()
+
+
+def _to_timestamp(iso: str | None) -> int | None:
+    if iso is None:
+        return None
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+def migrate_db(db_path: Path, quiet: bool = False):
+    """Upgrade an existing state.db (or a copy of it, such as manifest.db) to the current schema, in place."""
+    # Don't let sqlite3.connect create an empty database where there is none
+    if not db_path.exists():
+        return
+
+    conn = sqlite3.connect(db_path)
+    has_files = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files'"
+    ).fetchone()
+    if not has_files or conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        conn.close()
+        return
+
+    if not quiet:
+        print(f"Upgrading {db_path.name}...", end=" ", flush=True)
+
+    conn.executescript("BEGIN;\nALTER TABLE files RENAME TO files_v0;\n" + SCHEMA)
+    dir_ids = {}
+    old_rows = conn.execute(
+        "SELECT path, backup_name, file_type, size, status, chunks_total, chunks_uploaded, "
+        "discovered_at, uploaded_at FROM files_v0 ORDER BY path"
+    )
+    for path, backup_name, file_type, size, status, chunks_total, chunks_uploaded, discovered_at, uploaded_at in old_rows:
+        relative = Path(path)
+        conn.execute(
+            "INSERT INTO files (dir_id, name, backup_name, file_type, size, status, chunks_total, "
+            "chunks_uploaded, discovered_at, uploaded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                get_dir_id(conn, relative.parent.parts, dir_ids), relative.name, backup_name,
+                FILE_TYPE[file_type], size, STATUS[status], chunks_total, chunks_uploaded,
+                _to_timestamp(discovered_at), _to_timestamp(uploaded_at),
+            ),
+        )
+    conn.execute("DROP TABLE files_v0")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+    # Reclaim the space freed by the old table
+    conn.execute("VACUUM")
     conn.close()
+    if not quiet:
+        print("done.")
 
 
 def init_backup(directory: Path) -> dict:
@@ -71,6 +147,7 @@ def init_backup(directory: Path) -> dict:
 
     if config_path.exists():
         config = json.loads(config_path.read_text())
+        migrate_db(backup_dir / STATE_DB)
         return config
 
     backup_dir.mkdir(exist_ok=True)
@@ -0,0 +1,318 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import requests
+
+from mediabackup.init import migrate_db
+from mediabackup.state import STATUS, get_dir_paths, join_rel_path
+from mediabackup.uploader import MAX_RETRIES, RETRY_DELAYS, _fmt_size
+
+RESTORE_DIR_NAME = ".mediabackup-restore"
+MANIFEST_DB = "manifest.db"
+PART_SUFFIX = ".part"
+
+DEFAULT_WORKERS = 8  # downloads in flight
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+
+# Pieces already written to a file's .part copy, so an interrupted restore can resume.
+# A complete file is a single piece with chunk_index 0. Keyed by backup_name,
+# which stays the same when the manifest is refreshed.
+RESTORED_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS restored (
+    backup_name TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    PRIMARY KEY (backup_name, chunk_index)
+);
+"""
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """One session per thread, so each worker reuses its connection across downloads."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _get_with_retry(url, params, stream=False):
+    """GET with retry and backoff. Returns response or raises ConnectionError."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = _session().get(url, params=params, stream=stream)
+            if response.ok or response.status_code < 500 or attempt == MAX_RETRIES:
+                return response
+            # Server error (5xx) — worth retrying
+            response.close()
+        except requests.ConnectionError:
+            if attempt == MAX_RETRIES:
+                raise
+        time.sleep(RETRY_DELAYS[attempt])
+    return response
+
+
+def _download_at(url, params, dest: Path, offset: int, expected: int | None = None) -> int | None:
+    """Stream a download into `dest` starting at `offset`. Returns bytes written, or None on failure.
+
+    With `expected`, a response longer than that is rejected rather than
+    written past the end of the piece. Raises ConnectionError only if the
+    server can't be reached at all.
+    """
+    with _get_with_retry(url, params, stream=True) as response:
+        if not response.ok:
+            return None
+        content_length = response.headers.get("Content-Length")
+        if expected is not None and content_length is not None and int(content_length) != expected:
+            return None
+
+        written = 0
+        try:
+            # Each piece opens its own handle, so concurrent pieces never share a file position
+            with open(dest, "r+b") as f:
+                f.seek(offset)
+                for block in response.iter_content(DOWNLOAD_BLOCK_SIZE):
+                    if expected is not None and written + len(block) > expected:
+                        return None
+                    f.write(block)
+                    written += len(block)
+        except (requests.RequestException, OSError):
+            # Body cut off mid-transfer, or the target could not be written
+            return None
+    return written
+
+
+def _fetch_manifest(api_endpoint: str, backup_id: str, db_path: Path) -> bool:
+    """Download the latest manifest.db, keeping progress from a previous run. Returns True on success."""
+    print("Downloading manifest...", end=" ", flush=True)
+    partial_path = db_path.with_suffix(PART_SUFFIX)
+    partial_path.write_bytes(b"")
+
+    try:
+        size = _download_at(f"{api_endpoint}/api/manifest", {"backup_id": backup_id}, partial_path, 0)
+    except requests.ConnectionError:
+        partial_path.unlink()
+        print("failed (connection error)")
+        return False
+
+    if size is None:
+        partial_path.unlink()
+        print("failed (not found on server)")
+        return False
+
+    migrate_db(partial_path, quiet=True)
+    conn = sqlite3.connect(partial_path)
+    conn.executescript(RESTORED_SCHEMA)
+    if db_path.exists():
+        # Carry over the pieces restored with the previous manifest
+        conn.execute("ATTACH DATABASE ? AS previous", (str(db_path),))
+        conn.execute("INSERT OR IGNORE INTO restored SELECT backup_name, chunk_index FROM previous.restored")
+        conn.commit()
+        conn.execute("DETACH DATABASE previous")
+    conn.close()
+
+    partial_path.replace(db_path)
+    print(f"done ({_fmt_size(size)}).")
+    return True
+
+
+def _list_chunks(api_endpoint: str, backup_id: str, backup_name: str) -> list | None:
+    """Return [(chunk_index, offset, size), ...] for a chunked file, or None if it is not on the server."""
+    try:
+        response = _get_with_retry(
+            f"{api_endpoint}/api/chunks",
+            {"backup_id": backup_id, "backup_name": backup_name},
+        )
+        if not response.ok:
+            return None
+        chunks = response.json()["chunks"]
+    except requests.ConnectionError:
+        raise
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+    pieces = []
+    offset = 0
+    for chunk in sorted(chunks, key=lambda c: c["chunk_index"]):
+        pieces.append((chunk["chunk_index"], offset, chunk["size"]))
+        offset += chunk["size"]
+    return pieces
+
+
+def _prepare_part(conn: sqlite3.Connection, backup_name: str, part: Path, size: int) -> set:
+    """Make sure the .part file being restored into exists at full size. Returns the chunk indexes already in it.
+
+    Only the .part file is ever created or truncated here, never the restored file itself.
+    """
+    done = {row[0] for row in conn.execute("SELECT chunk_index FROM restored WHERE backup_name = ?", (backup_name,))}
+
+    if done and part.exists() and part.stat().st_size == size:
+        return done
+
+    # New file, or the earlier partial copy is gone — start it over
+    conn.execute("DELETE FROM restored WHERE backup_name = ?", (backup_name,))
+    conn.commit()
+    part.parent.mkdir(parents=True, exist_ok=True)
+    with open(part, "wb") as f:
+        f.truncate(size)
+    return set()
+
+
+def restore_backup(backup_id: str, target: Path, api_endpoint: str, workers: int = DEFAULT_WORKERS):
+    """Download every uploaded file of a backup into `target`, recreating the original paths."""
+    restore_dir = target / RESTORE_DIR_NAME
+    restore_dir.mkdir(parents=True, exist_ok=True)
+    db_path = restore_dir / MANIFEST_DB
+    root = target.resolve()
+
+    if not _fetch_manifest(api_endpoint, backup_id, db_path):
+        return
+
+    conn = sqlite3.connect(db_path)
+    dir_paths = get_dir_paths(conn)
+
+    total = conn.execute(
+        "SELECT COUNT(*), SUM(size) FROM files WHERE status = ?", (STATUS["complete"],)
+    ).fetchone()
+    not_uploaded = conn.execute(
+        "SELECT COUNT(*) FROM files WHERE status != ?", (STATUS["complete"],)
+    ).fetchone()[0]
+
+    print(f"Restoring {total[0]} files ({_fmt_size(total[1] or 0)}) to {target}")
+    if not_uploaded:
+        print(f"  ({not_uploaded} files were never fully uploaded and will be skipped)")
+
+    # Futures -> job. A job is ("list", file) for a chunk listing, or
+    # ("piece", file, chunk_index, expected size) for one download.
+    # A file is a dict with its paths and, once its pieces are submitted,
+    # how many are left and whether all of them delivered their expected size.
+    # The expected sizes add up to files.size, so an ok file is verified
+    # against the manifest before its .part replaces the real path.
+    in_flight = {}
+    restored = skipped = failed = 0
+    pool = ThreadPoolExecutor(max_workers=workers)
+
+    def report(rel_path, message):
+        print(f"\r[{restored + skipped + failed}/{total[0]}] {rel_path} - {message}")
+
+    def finish(file):
+        nonlocal restored, failed
+        if file["ok"]:
+            file["part"].replace(file["dest"])
+            restored += 1
+        else:
+            failed += 1
+            report(file["rel_path"], "missing data, re-run to retry")
+            # Keep a .part with restored pieces to resume into; an empty one is just clutter
+            has_pieces = conn.execute(
+                "SELECT 1 FROM restored WHERE backup_name = ? LIMIT 1", (file["backup_name"],)
+            ).fetchone()
+            if not has_pieces:
+                file["part"].unlink(missing_ok=True)
+
+    def start_pieces(file, pieces):
+        done = _prepare_part(conn, file["backup_name"], file["part"], file["size"])
+        pieces = [p for p in pieces if p[0] not in done]
+        file["left"] = len(pieces)
+        file["ok"] = True
+        if not pieces:
+            finish(file)
+            return
+
+        url = f"{api_endpoint}/api/chunk" if file["chunked"] else f"{api_endpoint}/api/file"
+        for chunk_index, offset, piece_size in pieces:
+            params = {"backup_id": backup_id, "backup_name": file["backup_name"]}
+            if file["chunked"]:
+                params["chunk_index"] = chunk_index
+            future = pool.submit(_download_at, url, params, file["part"], offset, piece_size)
+            in_flight[future] = ("piece", file, chunk_index, piece_size)
+
+    def collect(block: bool):
+        """Handle finished jobs. With `block`, waits for at least one."""
+        nonlocal failed
+        finished, _ = wait(in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in finished:
+            kind, file, *piece = in_flight.pop(future)
+            if kind == "list":
+                pieces = future.result()
+                if pieces is None or len(pieces) != file["chunks_total"] or sum(p[2] for p in pieces) != file["size"]:
+                    failed += 1
+                    report(file["rel_path"], "chunks missing on server, skipping")
+                else:
+                    start_pieces(file, pieces)
+                continue
+
+            chunk_index, expected = piece
+            file["left"] -= 1
+            if future.result() == expected:
+                conn.execute(
+                    "INSERT OR IGNORE INTO restored (backup_name, chunk_index) VALUES (?, ?)",
+                    (file["backup_name"], chunk_index),
+                )
+                conn.commit()
+            else:
+                file["ok"] = False
+            if file["left"] == 0:
+                finish(file)
+        print(f"\r[{restored + skipped + failed}/{total[0]}] restored", end="", flush=True)
+
+    files = conn.execute(
+        "SELECT dir_id, name, backup_name, size, chunks_total FROM files WHERE status = ? ORDER BY id",
+        (STATUS["complete"],),
+    )
+    try:
+        for dir_id, name, backup_name, size, chunks_total in files:
+            rel_path = join_rel_path(dir_paths[dir_id], name)
+            dest = (target / rel_path).resolve()
+            if dest == root or not dest.is_relative_to(root):
+                failed += 1
+                report(rel_path, "path outside target, skipping")
+                continue
+
+            file = {
+                "rel_path": rel_path,
+                "dest": dest,
+                "part": dest.with_name(dest.name + PART_SUFFIX),
+                "backup_name": backup_name,
+                "size": size,
+                "chunks_total": chunks_total,
+                "chunked": chunks_total is not None,
+            }
+
+            pieces_done = conn.execute(
+                "SELECT COUNT(*) FROM restored WHERE backup_name = ?", (backup_name,)
+            ).fetchone()[0]
+            if (
+                pieces_done == (chunks_total or 1)
+                and not file["part"].exists()
+                and dest.exists()
+                and dest.stat().st_size == size
+            ):
+                skipped += 1
+                continue
+
+            if file["chunked"]:
+                # Listed on a worker, so a slow listing doesn't hold up submitting other files
+                future = pool.submit(_list_chunks, api_endpoint, backup_id, backup_name)
+                in_flight[future] = ("list", file)
+            else:
+                start_pieces(file, [(0, 0, size)])
+
+            # Keep the number of queued jobs bounded
+            while len(in_flight) >= workers * 2:
+                collect(block=True)
+            collect(block=False)
+
+        while in_flight:
+            collect(block=True)
+    except requests.ConnectionError:
+        print("\nConnection lost, exiting (re-run to resume)")
+        pool.shutdown(wait=True, cancel_futures=True)
+        conn.close()
+        return
+
+    pool.shutdown()
+    conn.close()
+    print(f"\nDone. {restored} restored, {skipped} already present, {failed} failed.")
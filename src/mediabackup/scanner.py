@@ -1,8 +1,8 @@
 import sqlite3
-from datetime import datetime, timezone
 from pathlib import Path
 
 from mediabackup.init import BACKUP_DIR_NAME, STATE_DB, DEFAULT_CHUNK_SIZE
+from mediabackup.state import FILE_TYPE, STATUS, get_dir_id, load_dir_ids, timestamp_now
 
 EXTENSION_TO_TYPE = {}
 for _type, _exts in {
@@ -53,7 +53,9 @@ def scan_directory(directory: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dic
     conn = sqlite3.connect(db_path)
     conn.execute("BEGIN")
 
-    now = datetime.now(timezone.utc).isoformat()
+    now = timestamp_now()
+    dir_ids = load_dir_ids(conn)
+    last_parent = dir_id = None
     new_counts = {"image": 0, "video": 0, "audio": 0, "document": 0}
     skipped = 0
 
@@ -73,11 +75,14 @@ def scan_directory(directory: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dic
         if file_type is None:
             continue
 
-        relative = str(file_path.relative_to(directory))
+        # Sorted paths arrive grouped by directory, so only resolve dir_id when it changes
+        if file_path.parent != last_parent:
+            last_parent = file_path.parent
+            dir_id = get_dir_id(conn, last_parent.relative_to(directory).parts, dir_ids)
 
         # Skip if already tracked
         existing = conn.execute(
-            "SELECT 1 FROM files WHERE path = ?", (relative,)
+            "SELECT 1 FROM files WHERE dir_id = ? AND name = ?", (dir_id, file_path.name)
         ).fetchone()
         if existing:
             skipped += 1
@@ -91,9 +96,9 @@ def scan_directory(directory: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dic
         backup_name = _get_next_backup_name(conn, file_type, ext)
 
         conn.execute(
-            "INSERT INTO files (path, backup_name, file_type, size, status, chunks_total, discovered_at) "
-            "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
-            (relative, backup_name, file_type, size, chunks_total, now),
+            "INSERT INTO files (dir_id, name, backup_name, file_type, size, status, chunks_total, discovered_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (dir_id, file_path.name, backup_name, FILE_TYPE[file_type], size, STATUS["pending"], chunks_total, now),
         )
         new_counts[file_type] += 1
 
@@ -0,0 +1,60 @@
+import sqlite3
+import time
+
+# Integer codes stored in state.db in place of repeated strings
+STATUS = {"pending": 0, "uploading": 1, "complete": 2, "failed": 3}
+FILE_TYPE = {"image": 0, "video": 1, "audio": 2, "document": 3}
+
+STATUS_NAMES = {code: name for name, code in STATUS.items()}
+FILE_TYPE_NAMES = {code: name for name, code in FILE_TYPE.items()}
+
+ROOT_DIR_ID = 0
+
+
+def timestamp_now() -> int:
+    """Current time as integer Unix seconds (UTC), as stored in state.db."""
+    return int(time.time())
+
+
+def load_dir_ids(conn: sqlite3.Connection) -> dict:
+    """Load the dirs table as a (parent_id, name) -> id cache for get_dir_id."""
+    return {(parent_id, name): dir_id for dir_id, parent_id, name in conn.execute("SELECT id, parent_id, name FROM dirs")}
+
+
+def get_dir_id(conn: sqlite3.Connection, parts: tuple, cache: dict) -> int:
+    """Return the dirs id for a relative directory given as path parts, inserting missing levels.
+
+    `cache` maps (parent_id, name) to id (see load_dir_ids) and should be reused across calls.
+    """
+    dir_id = ROOT_DIR_ID
+    for name in parts:
+        key = (dir_id, name)
+        if key not in cache:
+            row = conn.execute(
+                "SELECT id FROM dirs WHERE parent_id = ? AND name = ?", key
+            ).fetchone()
+            if row is None:
+                cache[key] = conn.execute(
+                    "INSERT INTO dirs (parent_id, name) VALUES (?, ?)", key
+                ).lastrowid
+            else:
+                cache[key] = row[0]
+        dir_id = cache[key]
+    return dir_id
+
+
+def get_dir_paths(conn: sqlite3.Connection) -> dict:
+    """Map every dirs id to its relative path ("" for the root, "/"-separated below it)."""
+    paths = {}
+    # Parents are always inserted before their children, so ids come out in a usable order
+    for dir_id, parent_id, name in conn.execute("SELECT id, parent_id, name FROM dirs ORDER BY id"):
+        if parent_id is None:
+            paths[dir_id] = ""
+        else:
+            parent = paths[parent_id]
+            paths[dir_id] = f"{parent}/{name}" if parent else name
+    return paths
+
+
+def join_rel_path(dir_path: str, name: str) -> str:
+    return f"{dir_path}/{name}" if dir_path else name
@@ -2,6 +2,7 @@ import sqlite3
 from pathlib import Path
 
 from mediabackup.init import BACKUP_DIR_NAME, STATE_DB
+from mediabackup.state import FILE_TYPE_NAMES, STATUS_NAMES
 
 
 def _format_size(size_bytes: int) -> str:
@@ -27,13 +28,13 @@ def get_status(directory: Path) -> dict:
     rows = conn.execute(
         "SELECT file_type, COUNT(*), SUM(size) FROM files GROUP BY file_type"
     ).fetchall()
-    by_type = {row[0]: {"count": row[1], "size": row[2]} for row in rows}
+    by_type = {FILE_TYPE_NAMES[row[0]]: {"count": row[1], "size": row[2]} for row in rows}
 
     # Counts by status
     status_rows = conn.execute(
         "SELECT status, COUNT(*), SUM(size) FROM files GROUP BY status"
     ).fetchall()
-    by_status = {row[0]: {"count": row[1], "size": row[2]} for row in status_rows}
+    by_status = {STATUS_NAMES[row[0]]: {"count": row[1], "size": row[2]} for row in status_rows}
 
     conn.close()
 
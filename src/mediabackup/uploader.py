@@ -1,11 +1,16 @@
+import os
 import sqlite3
 import time
-from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from functools import partial
 from pathlib import Path
 
 import requests
 
-from mediabackup.init import BACKUP_DIR_NAME, STATE_DB
+from mediabackup.init import BACKUP_DIR_NAME, STATE_DB, DEFAULT_CHUNK_SIZE, DEFAULT_PREFETCH_DEPTH
+from mediabackup.state import STATUS, get_dir_paths, join_rel_path, timestamp_now
 
 MAX_RETRIES = 3
 RETRY_DELAYS = [2, 5, 10]  # seconds
@@ -15,17 +20,49 @@ def _get_db(directory: Path) -> sqlite3.Connection:
     return sqlite3.connect(directory / BACKUP_DIR_NAME / STATE_DB)
 
 
-def _set_status(conn: sqlite3.Connection, path: str, status: str):
+def _set_status(conn: sqlite3.Connection, file_id: int, status: str):
     uploaded_at = None
     if status == "complete":
-        uploaded_at = datetime.now(timezone.utc).isoformat()
+        uploaded_at = timestamp_now()
     conn.execute(
-        "UPDATE files SET status = ?, uploaded_at = COALESCE(?, uploaded_at) WHERE path = ?",
-        (status, uploaded_at, path),
+        "UPDATE files SET status = ?, uploaded_at = COALESCE(?, uploaded_at) WHERE id = ?",
+        (STATUS[status], uploaded_at, file_id),
     )
     conn.commit()
 
 
+def _open_sequential(file_path: Path):
+    """Open a file for reading and hint the kernel that it will be read front to back."""
+    f = open(file_path, "rb")
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return f
+
+
+def _read_file(file_path: Path) -> bytes:
+    with _open_sequential(file_path) as f:
+        return f.read()
+
+
+def _read_ahead(reads, depth: int):
+    """Run each read callable on a background thread and yield the results in order.
+
+    Up to `depth` reads are kept in flight ahead of the result being consumed,
+    so at most depth + 1 buffers are held in memory at once.
+    """
+    reader = ThreadPoolExecutor(max_workers=1)
+    in_flight = deque()
+    try:
+        for read in reads:
+            in_flight.append(reader.submit(read))
+            if len(in_flight) > depth:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        reader.shutdown(wait=True, cancel_futures=True)
+
+
 def _post_with_retry(url, data, files):
     """POST with retry and backoff. Returns response or raises ConnectionError."""
     for attempt in range(MAX_RETRIES + 1):
@@ -50,14 +87,24 @@ def _post_with_retry(url, data, files):
     return response
 
 
-def simple_upload(file_path: Path, backup_name: str, backup_id: str, api_endpoint: str) -> bool:
-    """Upload a file < 5MB as a single request. Returns True on success."""
-    with open(file_path, "rb") as f:
-        response = _post_with_retry(
-            f"{api_endpoint}/api/upload",
-            data={"backup_id": backup_id, "backup_name": backup_name},
-            files={"file": (backup_name, f)},
-        )
+def simple_upload(
+    file_path: Path,
+    backup_name: str,
+    backup_id: str,
+    api_endpoint: str,
+    file_data: bytes | None = None,
+) -> bool:
+    """Upload a file < 5MB as a single request. Returns True on success.
+
+    If `file_data` is given (already read ahead), it is sent instead of re-reading the file.
+    """
+    if file_data is None:
+        file_data = _read_file(file_path)
+    response = _post_with_retry(
+        f"{api_endpoint}/api/upload",
+        data={"backup_id": backup_id, "backup_name": backup_name},
+        files={"file": (backup_name, file_data)},
+    )
     return response.ok
 
 
@@ -70,42 +117,92 @@ def chunked_upload(
     chunks_uploaded: int,
     chunk_size: int,
     conn: sqlite3.Connection,
-    rel_path: str,
+    file_id: int,
     progress_prefix: str,
+    prefetch_depth: int = DEFAULT_PREFETCH_DEPTH,
 ) -> bool:
-    """Upload a file >= 5MB in chunks. Returns True on success."""
-    with open(file_path, "rb") as f:
+    """Upload a file >= 5MB in chunks. Returns True on success.
+
+    The next `prefetch_depth` chunks are read from disk while the current one is sent.
+    """
+    with _open_sequential(file_path) as f:
         f.seek(chunks_uploaded * chunk_size)
+        reads = (partial(f.read, chunk_size) for _ in range(chunks_uploaded, chunks_total))
+
+        # Closing the read-ahead stops the reader thread before the file is closed
+        with closing(_read_ahead(reads, prefetch_depth)) as chunks:
+            for chunk_index, chunk_data in enumerate(chunks, start=chunks_uploaded):
+                print(f"\r{progress_prefix} chunk {chunk_index + 1}/{chunks_total}...", end="", flush=True)
+
+                response = _post_with_retry(
+                    f"{api_endpoint}/api/chunk",
+                    data={
+                        "backup_id": backup_id,
+                        "backup_name": backup_name,
+                        "chunk_index": chunk_index,
+                        "chunks_total": chunks_total,
+                    },
+                    files={"chunk": (f"chunk_{chunk_index:03d}", chunk_data)},
+                )
+
+                if not response.ok:
+                    print(f"\r{progress_prefix} chunk {chunk_index + 1}/{chunks_total} - failed")
+                    return False
 
-        for chunk_index in range(chunks_uploaded, chunks_total):
-            chunk_data = f.read(chunk_size)
-            print(f"\r{progress_prefix} chunk {chunk_index + 1}/{chunks_total}...", end="", flush=True)
-
-            response = _post_with_retry(
-                f"{api_endpoint}/api/chunk",
-                data={
-                    "backup_id": backup_id,
-                    "backup_name": backup_name,
-                    "chunk_index": chunk_index,
-                    "chunks_total": chunks_total,
-                },
-                files={"chunk": (f"chunk_{chunk_index:03d}", chunk_data)},
-            )
-
-            if not response.ok:
-                print(f"\r{progress_prefix} chunk {chunk_index + 1}/{chunks_total} - failed")
-                return False
-
-            conn.execute(
-                "UPDATE files SET chunks_uploaded = ? WHERE path = ?",
-                (chunk_index + 1, rel_path),
-            )
-            conn.commit()
+                conn.execute(
+                    "UPDATE files SET chunks_uploaded = ? WHERE id = ?",
+                    (chunk_index + 1, file_id),
+                )
+                conn.commit()
 
     print(f"\r{progress_prefix} {chunks_total}/{chunks_total} chunks ✓")
     return True
 
 
+_QUEUE_COLUMNS = "id, dir_id, name, backup_name, size, chunks_total, chunks_uploaded"
+
+
+def _queued_files(conn: sqlite3.Connection, interrupted):
+    """Yield file rows in upload order: the interrupted file, then pending files smallest first.
+
+    Rows are fetched one at a time past a (size, id) cursor, because files
+    already read ahead are still pending when the next row is fetched.
+    Each row is (id, rel_path, backup_name, size, chunks_total, chunks_uploaded).
+    """
+    dir_paths = get_dir_paths(conn)
+
+    def resolve(row):
+        file_id, dir_id, name, *rest = row
+        return (file_id, join_rel_path(dir_paths[dir_id], name), *rest)
+
+    if interrupted is not None:
+        yield resolve(interrupted)
+
+    last = (-1, -1)
+    while True:
+        row = conn.execute(
+            f"SELECT {_QUEUE_COLUMNS} FROM files "
+            "WHERE status = ? AND (size, id) > (?, ?) ORDER BY size ASC, id ASC LIMIT 1",
+            (STATUS["pending"], *last),
+        ).fetchone()
+        if row is None:
+            return
+        yield resolve(row)
+        last = (row[4], row[0])
+
+
+def _read_queued(directory: Path, row) -> tuple:
+    """Read a queued small file ahead of its upload. Chunked files are read by chunked_upload."""
+    _, rel_path, _, _, chunks_total, _ = row
+    file_data = None
+    if chunks_total is None:
+        try:
+            file_data = _read_file(directory / rel_path)
+        except OSError:
+            pass  # reported when the file comes up for upload
+    return row, file_data
+
+
 def upload_pending(directory: Path, config: dict):
     """Upload all pending files, smallest first."""
     api_endpoint = config["api_endpoint"]
@@ -114,7 +211,8 @@ def upload_pending(directory: Path, config: dict):
 
     # Count remaining for progress display
     total_remaining = conn.execute(
-        "SELECT COUNT(*) FROM files WHERE status IN ('pending', 'uploading')"
+        "SELECT COUNT(*) FROM files WHERE status IN (?, ?)",
+        (STATUS["pending"], STATUS["uploading"]),
     ).fetchone()[0]
 
     if total_remaining == 0:
@@ -125,60 +223,53 @@ def upload_pending(directory: Path, config: dict):
     print(f"Uploading (smallest first)...")
     uploaded = 0
 
-    chunk_size = config.get("chunk_size", 5 * 1024 * 1024)
+    chunk_size = config.get("chunk_size", DEFAULT_CHUNK_SIZE)
+    prefetch_depth = config.get("prefetch_depth", DEFAULT_PREFETCH_DEPTH)
 
     # Resume any interrupted upload first
     interrupted = conn.execute(
-        "SELECT path, backup_name, size, chunks_total, chunks_uploaded FROM files "
-        "WHERE status = 'uploading' LIMIT 1"
+        f"SELECT {_QUEUE_COLUMNS} FROM files WHERE status = ? LIMIT 1",
+        (STATUS["uploading"],),
     ).fetchone()
 
-    while True:
-        if interrupted is not None:
-            row = interrupted
-            interrupted = None
-        else:
-            row = conn.execute(
-                "SELECT path, backup_name, size, chunks_total, chunks_uploaded FROM files "
-                "WHERE status = 'pending' ORDER BY size ASC LIMIT 1"
-            ).fetchone()
-
-        if row is None:
-            break
+    # Small files are read from disk ahead of time while earlier ones are sent
+    reads = (partial(_read_queued, directory, row) for row in _queued_files(conn, interrupted))
 
-        rel_path, backup_name, size, chunks_total, chunks_uploaded = row
-        file_path = directory / rel_path
-        uploaded += 1
-        prefix = f"[{uploaded}/{total_remaining}] {backup_name} ({_fmt_size(size)})"
+    with closing(_read_ahead(reads, prefetch_depth)) as queued:
+        for row, file_data in queued:
+            file_id, rel_path, backup_name, size, chunks_total, chunks_uploaded = row
+            file_path = directory / rel_path
+            uploaded += 1
+            prefix = f"[{uploaded}/{total_remaining}] {backup_name} ({_fmt_size(size)})"
 
-        if not file_path.exists():
-            print(f"{prefix} - file not found, skipping")
-            _set_status(conn, rel_path, "failed")
-            continue
-
-        _set_status(conn, rel_path, "uploading")
+            if not file_path.exists():
+                print(f"{prefix} - file not found, skipping")
+                _set_status(conn, file_id, "failed")
+                continue
 
-        try:
-            if chunks_total is not None:
-                ok = chunked_upload(
-                    file_path, backup_name, backup_id, api_endpoint,
-                    chunks_total, chunks_uploaded, chunk_size,
-                    conn, rel_path, prefix,
-                )
+            _set_status(conn, file_id, "uploading")
+
+            try:
+                if chunks_total is not None:
+                    ok = chunked_upload(
+                        file_path, backup_name, backup_id, api_endpoint,
+                        chunks_total, chunks_uploaded, chunk_size,
+                        conn, file_id, prefix, prefetch_depth,
+                    )
+                else:
+                    ok = simple_upload(file_path, backup_name, backup_id, api_endpoint, file_data)
+            except requests.ConnectionError:
+                print(f"\n{prefix} - connection lost, exiting (re-run to resume)")
+                conn.close()
+                return
+
+            if ok:
+                _set_status(conn, file_id, "complete")
+                if chunks_total is None:
+                    print(f"{prefix} ✓")
             else:
-                ok = simple_upload(file_path, backup_name, backup_id, api_endpoint)
-        except requests.ConnectionError:
-            print(f"\n{prefix} - connection lost, exiting (re-run to resume)")
-            conn.close()
-            return
-
-        if ok:
-            _set_status(conn, rel_path, "complete")
-            if chunks_total is None:
-                print(f"{prefix} ✓")
-        else:
-            print(f"{prefix} - upload failed")
-            _set_status(conn, rel_path, "pending")
+                print(f"{prefix} - upload failed")
+                _set_status(conn, file_id, "pending")
 
     conn.close()
     print("Done.")